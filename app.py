@@ -1,12 +1,26 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.util.request import ACCEPT_ENCODING
 import pandas as pd
 import numpy as np
-import plotly.express as px
-from datetime import datetime
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
+import plotly.graph_objects as go
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlencode, quote
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from cache import FileCache
+
+# Prefer orjson for decoding API payloads; fall back to the stdlib parser
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
 # Configure page
 st.set_page_config(
@@ -78,218 +92,452 @@ st.markdown("""
 # API Configuration
 BASE_URL = "https://service.upstox.com/option-analytics-tool/open/v1"
 MARKET_DATA_URL = "https://service.upstox.com/market-data-api/v2/open/quote"
+NIFTY_QUOTE_URL = f"{MARKET_DATA_URL}?{urlencode({'i': 'NSE_INDEX|Nifty 50'}, quote_via=quote)}"
 HEADERS = {
     "accept": "application/json",
     "content-type": "application/json"
 }
+ASSET_KEYS = ["NSE_INDEX|Nifty 50", "NSE_INDEX|Bank Nifty"]
+CHAIN_CACHE_TTL = 30  # Seconds before a cached option chain is re-fetched
+OPTIONS_DATA_TTL = 300  # Seconds fetch_options_data keeps a chain in memory
+REQUEST_TIMEOUT = (3.05, 10)  # (connect, read) seconds; fail fast on a dead host
+chain_cache = FileCache()
+
+# Shared HTTP session (kept across reruns so connections are reused)
+@st.cache_resource
+def get_http_session():
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    # Every encoding urllib3 can decode here: gzip and deflate, plus br/zstd
+    # when the optional brotli/zstandard packages are installed
+    session.headers.update({"Accept-Encoding": ACCEPT_ENCODING})
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=10,
+        # Retry transient gateway errors too; once retries run out, hand back
+        # the last response so callers report its status as before
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.2,
+            status_forcelist=[502, 503, 504],
+            raise_on_status=False
+        )
+    )
+    session.mount("https://", adapter)
+    return session
+
+# Short, decoded start of a response body for error messages; avoids decoding
+# (and printing) a full chain payload just to report a failure
+def response_preview(response, limit=500):
+    return response.content[:limit].decode("utf-8", errors="replace")
+
+def options_chain_url(asset_key, expiry):
+    params = {'assetKey': asset_key, 'strategyChainType': 'PC_CHAIN', 'expiry': expiry}
+    return f"{BASE_URL}/strategy-chains?{urlencode(params, quote_via=quote)}"
+
+# Expiry days end at midnight Indian Standard Time (no DST)
+IST = timezone(timedelta(hours=5, minutes=30))
+
+# Unix time after which a chain for this expiry can no longer change. A copy
+# fetched after it is final; one fetched before it, even if the expiry has
+# since passed, still goes stale after CHAIN_CACHE_TTL.
+def chain_final_after(expiry):
+    expiry_day = datetime.strptime(expiry, "%d-%m-%Y").replace(tzinfo=IST)
+    return (expiry_day + timedelta(days=1)).timestamp()
+
+# Raw chain body from the on-disk cache, revalidating a stale copy with its
+# ETag when needed. Returns (body, response); body is None on failure and
+# response is None when the fresh cached copy was used.
+def fetch_chain_body(asset_key, expiry):
+    url = options_chain_url(asset_key, expiry)
+    cached = chain_cache.get(url, CHAIN_CACHE_TTL, final_after=chain_final_after(expiry))
+    if cached is not None:
+        return cached, None
+    
+    stale, etag = chain_cache.get_stale(url)
+    headers = {"If-None-Match": etag} if etag else None
+    response = get_http_session().get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    
+    if response.status_code == 304 and stale is not None:
+        chain_cache.touch(url)
+        return stale, response
+    elif response.status_code == 200:
+        chain_cache.put(url, response.content, response.headers.get("ETag"))
+        return response.content, response
+    return None, response
+
+# When each chain last went through fetch_options_data's body, i.e. was put
+# into its in-memory cache; shared across sessions like that cache is
+@st.cache_resource
+def get_chain_fetch_times():
+    return {}
+
+# Whether fetch_options_data still holds this chain in memory
+def chain_in_memory(asset_key, expiry):
+    fetched_at = get_chain_fetch_times().get((asset_key, expiry))
+    return fetched_at is not None and time.monotonic() - fetched_at < OPTIONS_DATA_TTL
 
 # Fetch data from API
-@st.cache_data(ttl=300)  # Cache for 5 minutes
+@st.cache_data(ttl=OPTIONS_DATA_TTL)  # Cache for 5 minutes
 def fetch_options_data(asset_key="NSE_INDEX|Nifty 50", expiry="03-04-2025"):
-    url = f"{BASE_URL}/strategy-chains?assetKey={asset_key}&strategyChainType=PC_CHAIN&expiry={expiry}"
-    response = requests.get(url, headers=HEADERS)
-    
-    if response.status_code == 200:
-        return response.json()
-    else:
-        st.error(f"Failed to fetch data: {response.status_code} - {response.text}")
+    get_chain_fetch_times()[(asset_key, expiry)] = time.monotonic()
+    body, response = fetch_chain_body(asset_key, expiry)
+    if body is None:
+        st.error(f"Failed to fetch data: {response.status_code} - {response_preview(response)}")
         return None
+    return json_loads(body)
+
+# Background pool for chain prefetches plus when each URL was last queued;
+# both are shared across sessions and reruns
+@st.cache_resource
+def get_prefetcher():
+    return ThreadPoolExecutor(max_workers=2), {}, threading.Lock()
+
+# Warm the on-disk chain cache for a chain the user is likely to open next,
+# so switching to it skips the network round-trip. Runs off the script
+# thread, so failures are silently ignored rather than reported.
+def prefetch_options_data(asset_key, expiry):
+    url = options_chain_url(asset_key, expiry)
+    if chain_cache.is_fresh(url, CHAIN_CACHE_TTL, final_after=chain_final_after(expiry)):
+        return
+    try:
+        fetch_chain_body(asset_key, expiry)
+    except requests.RequestException:
+        pass
+
+# Queue a prefetch unless the chain is already in memory or was queued within
+# the last OPTIONS_DATA_TTL seconds, so reruns never repeat a pending or
+# recent request
+def submit_prefetch(asset_key, expiry):
+    if chain_in_memory(asset_key, expiry):
+        return
+    executor, queued_at, lock = get_prefetcher()
+    url = options_chain_url(asset_key, expiry)
+    now = time.monotonic()
+    with lock:
+        if now - queued_at.get(url, -OPTIONS_DATA_TTL) < OPTIONS_DATA_TTL:
+            return
+        queued_at[url] = now
+    executor.submit(prefetch_options_data, asset_key, expiry)
 
 # Fetch live Nifty price
 @st.cache_data(ttl=60)  # Cache for 1 minute
 def fetch_nifty_price():
-    url = f"{MARKET_DATA_URL}?i=NSE_INDEX|Nifty%2050"
-    response = requests.get(url, headers=HEADERS)
+    response = get_http_session().get(NIFTY_QUOTE_URL, timeout=REQUEST_TIMEOUT)
     
     if response.status_code == 200:
-        data = response.json()
+        data = json_loads(response.content)
         return data['data']['lastPrice']
     else:
-        st.error(f"Failed to fetch Nifty price: {response.status_code} - {response.text}")
+        st.error(f"Failed to fetch Nifty price: {response.status_code} - {response_preview(response)}")
         return None
 
+# API field -> column suffix for each option leg section
+OPTION_FIELDS = {
+    'marketData': {
+        'ltp': 'ltp',
+        'bidPrice': 'bid',
+        'askPrice': 'ask',
+        'volume': 'volume',
+        'oi': 'oi',
+        'prevOi': 'prev_oi',
+    },
+    'analytics': {
+        'iv': 'iv',
+        'delta': 'delta',
+        'gamma': 'gamma',
+        'theta': 'theta',
+        'vega': 'vega',
+    },
+}
+OPTION_LEGS = {'callOptionData': 'call', 'putOptionData': 'put'}
+CHAIN_COLUMNS = ['strike', 'pcr'] + [
+    f"{prefix}_{name}"
+    for prefix in OPTION_LEGS.values()
+    for fields in OPTION_FIELDS.values()
+    for name in fields.values()
+]
+# Storage types: counts are int64 (index OI and volume can pass the int32
+# range) and everything not listed here stays float64. Prices, IV and greeks
+# are shown rounded, and float32 would flip the last displayed digit on ties.
+CHAIN_DTYPES = {}
+for prefix in OPTION_LEGS.values():
+    CHAIN_DTYPES.update({f"{prefix}_{name}": np.int64 for name in ('volume', 'oi', 'prev_oi')})
+MONEYNESS = pd.CategoricalDtype(['ITM', 'ATM', 'OTM'], ordered=True)
+
+# Per-leg metrics shown in the strike comparison table
+COMPARISON_METRICS = {
+    'LTP': 'ltp',
+    'Bid': 'bid',
+    'Ask': 'ask',
+    'Volume': 'volume',
+    'OI': 'oi',
+    'OI Change': 'oi_change',
+    'IV': 'iv',
+    'Delta': 'delta',
+    'Gamma': 'gamma',
+    'Theta': 'theta',
+    'Vega': 'vega',
+}
+
+# Per-leg columns shown on the top strike cards, in display order
+CARD_COLUMNS = {
+    prefix: ['strike'] + [f"{prefix}_{name}" for name in ('ltp', 'oi', 'oi_change', 'iv')]
+    for prefix in OPTION_LEGS.values()
+}
+
+# Run independent fetches on worker threads so their round-trips overlap.
+# Each call is a (function, *args) tuple; results come back in order.
+def fetch_concurrently(*calls):
+    # Attach this script run's context so cached functions and st.error
+    # keep working from the worker threads
+    ctx = get_script_run_ctx()
+    with ThreadPoolExecutor(
+        max_workers=len(calls),
+        initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx)
+    ) as executor:
+        futures = [executor.submit(func, *args) for func, *args in calls]
+        return [future.result() for future in futures]
+
 # Process raw API data
 def process_options_data(raw_data, spot_price):
     if not raw_data or 'data' not in raw_data:
         return None
     
     strike_map = raw_data['data']['strategyChainData']['strikeMap']
-    processed_data = []
     
+    # One flat list of numbers per strike instead of one dict per strike
+    rows = []
     for strike, data in strike_map.items():
-        call_data = data.get('callOptionData', {})
-        put_data = data.get('putOptionData', {})
-        
-        # Market data
-        call_market = call_data.get('marketData', {})
-        put_market = put_data.get('marketData', {})
-        
-        # Analytics data
-        call_analytics = call_data.get('analytics', {})
-        put_analytics = put_data.get('analytics', {})
-        
-        strike_float = float(strike)
-        
-        processed_data.append({
-            'strike': strike_float,
-            'pcr': data.get('pcr', 0),
-            
-            # Moneyness
-            'call_moneyness': 'ITM' if strike_float < spot_price else ('ATM' if strike_float == spot_price else 'OTM'),
-            'put_moneyness': 'ITM' if strike_float > spot_price else ('ATM' if strike_float == spot_price else 'OTM'),
-            
-            # Call data
-            'call_ltp': call_market.get('ltp', 0),
-            'call_bid': call_market.get('bidPrice', 0),
-            'call_ask': call_market.get('askPrice', 0),
-            'call_volume': call_market.get('volume', 0),
-            'call_oi': call_market.get('oi', 0),
-            'call_prev_oi': call_market.get('prevOi', 0),
-            'call_oi_change': call_market.get('oi', 0) - call_market.get('prevOi', 0),
-            'call_iv': call_analytics.get('iv', 0),
-            'call_delta': call_analytics.get('delta', 0),
-            'call_gamma': call_analytics.get('gamma', 0),
-            'call_theta': call_analytics.get('theta', 0),
-            'call_vega': call_analytics.get('vega', 0),
-            
-            # Put data
-            'put_ltp': put_market.get('ltp', 0),
-            'put_bid': put_market.get('bidPrice', 0),
-            'put_ask': put_market.get('askPrice', 0),
-            'put_volume': put_market.get('volume', 0),
-            'put_oi': put_market.get('oi', 0),
-            'put_prev_oi': put_market.get('prevOi', 0),
-            'put_oi_change': put_market.get('oi', 0) - put_market.get('prevOi', 0),
-            'put_iv': put_analytics.get('iv', 0),
-            'put_delta': put_analytics.get('delta', 0),
-            'put_gamma': put_analytics.get('gamma', 0),
-            'put_theta': put_analytics.get('theta', 0),
-            'put_vega': put_analytics.get('vega', 0),
-        })
+        row = [strike, data.get('pcr', 0)]
+        for leg in OPTION_LEGS:
+            leg_data = data.get(leg, {})
+            for section, fields in OPTION_FIELDS.items():
+                section_data = leg_data.get(section, {})
+                row.extend([section_data.get(field, 0) for field in fields])
+        rows.append(row)
+    
+    # Derive everything on plain arrays and build the DataFrame once. Call
+    # and put legs already share a row per strike, so sorting the rows by
+    # strike here is the only alignment step; later code relies on it.
+    try:
+        values = np.array(rows, dtype=float)
+    except (TypeError, ValueError):
+        # Some field is not a number (a string, or a nested dict/list): coerce
+        # column-wise, treating anything non-numeric as missing
+        values = pd.DataFrame(rows).apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    values = values.reshape(-1, len(CHAIN_COLUMNS))
+    values = values[~np.isnan(values[:, 0])]
+    values = np.nan_to_num(values[np.argsort(values[:, 0], kind='stable')], nan=0.0)
+    columns = {
+        name: column.astype(CHAIN_DTYPES.get(name, np.float64))
+        for name, column in zip(CHAIN_COLUMNS, values.T)
+    }
     
-    return pd.DataFrame(processed_data)
+    # Moneyness as categorical codes (calls are ITM below spot, puts above)
+    strikes = columns['strike']
+    call_codes = np.select([strikes < spot_price, strikes > spot_price], [0, 2], default=1).astype(np.int8)
+    columns['call_moneyness'] = pd.Categorical.from_codes(call_codes, dtype=MONEYNESS, validate=False)
+    columns['put_moneyness'] = pd.Categorical.from_codes(2 - call_codes, dtype=MONEYNESS, validate=False)
+    
+    # Previous OI is only needed for the change, so it is not kept on the chain
+    for prefix in OPTION_LEGS.values():
+        columns[f"{prefix}_oi_change"] = columns[f"{prefix}_oi"] - columns.pop(f"{prefix}_prev_oi")
+    columns['total_oi'] = columns['call_oi'] + columns['put_oi']
+    
+    # Spread metrics used by the trade recommendations
+    call_ltp, put_ltp = columns['call_ltp'], columns['put_ltp']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for prefix in OPTION_LEGS.values():
+            spread = columns[f"{prefix}_ask"] - columns[f"{prefix}_bid"]
+            columns[f"{prefix}_premium_ratio"] = spread / columns[f"{prefix}_ltp"]
+        columns['call_risk_reward'] = (spot_price - strikes + call_ltp) / call_ltp
+        columns['put_risk_reward'] = (strikes - spot_price + put_ltp) / put_ltp
+    
+    return pd.DataFrame(columns)
+
+# Processed chain for an asset/expiry at a given spot price. Widget reruns
+# hit this cache and skip rebuilding the DataFrame from the raw payload.
+@st.cache_data(ttl=300)
+def load_options_chain(asset_key, expiry, spot_price):
+    raw_data = fetch_options_data(asset_key, expiry)
+    if raw_data is None:
+        return None  # Fetch failed (already reported)
+    df = process_options_data(raw_data, spot_price)
+    return df if df is not None else pd.DataFrame()
 
 # Get top ITM/OTM strikes
 def get_top_strikes(df, spot_price, n=5):
-    # For calls: ITM = strike < spot, OTM = strike > spot
-    call_itm = df[df['strike'] < spot_price].sort_values('strike', ascending=False).head(n)
-    call_otm = df[df['strike'] > spot_price].sort_values('strike', ascending=True).head(n)
-    
-    # For puts: ITM = strike > spot, OTM = strike < spot
-    put_itm = df[df['strike'] > spot_price].sort_values('strike', ascending=True).head(n)
-    put_otm = df[df['strike'] < spot_price].sort_values('strike', ascending=False).head(n)
-    
+    # Rows are sorted by strike, so everything below/above spot is one slice
+    strikes = df['strike'].to_numpy()
+    below = df.iloc[:np.searchsorted(strikes, spot_price, side='left')]
+    above = df.iloc[np.searchsorted(strikes, spot_price, side='right'):]
+    nearest_below = below.iloc[::-1].head(n)
+    nearest_above = above.head(n)
+    
+    # Keep only the columns each leg's cards show
+    call_cols, put_cols = CARD_COLUMNS['call'], CARD_COLUMNS['put']
     return {
-        'call_itm': call_itm,
-        'call_otm': call_otm,
-        'put_itm': put_itm,
-        'put_otm': put_otm
+        # For calls: ITM = strike < spot, OTM = strike > spot
+        'call_itm': nearest_below[call_cols],
+        'call_otm': nearest_above[call_cols],
+        
+        # For puts: ITM = strike > spot, OTM = strike < spot
+        'put_itm': nearest_above[put_cols],
+        'put_otm': nearest_below[put_cols]
     }
 
+# Rank the strikes passing a screen and turn the top `n` into recommendations
+def screen_trades(df, trade_type, passes, n, reason):
+    leg = 'call' if 'CALL' in trade_type else 'put'
+    selling = trade_type.startswith('SELL')
+    
+    # Buys want the lowest premium ratio, sells the highest; OI change breaks ties
+    # in the opposite direction (np.lexsort sorts by its last key first)
+    sign = -1 if selling else 1
+    ratio = df[f'{leg}_premium_ratio'].to_numpy()
+    oi_change = df[f'{leg}_oi_change'].to_numpy()
+    candidates = np.flatnonzero(passes)
+    order = np.lexsort((-sign * oi_change[candidates], sign * ratio[candidates]))
+    picks = candidates[order[:n]]
+    
+    risk_reward = df[f'{leg}_risk_reward'].to_numpy()[picks]
+    if selling:
+        with np.errstate(divide='ignore'):
+            risk_reward = 1 / risk_reward
+    
+    return [
+        {
+            'type': trade_type,
+            'strike': strike,
+            'premium': premium,
+            'iv': iv,
+            'oi_change': change,
+            'risk_reward': f"{rr:.1f}:1",
+            'reason': reason
+        }
+        for strike, premium, iv, change, rr in zip(
+            df['strike'].to_numpy()[picks].tolist(),
+            df[f'{leg}_ltp'].to_numpy()[picks].tolist(),
+            df[f'{leg}_iv'].to_numpy()[picks].tolist(),
+            oi_change[picks].tolist(),
+            risk_reward.tolist()
+        )
+    ]
+
 # Generate trade recommendations
-def generate_trade_recommendations(df, spot_price):
-    recommendations = []
-    
-    # Calculate metrics for all strikes
-    df['call_premium_ratio'] = (df['call_ask'] - df['call_bid']) / df['call_ltp']
-    df['put_premium_ratio'] = (df['put_ask'] - df['put_bid']) / df['put_ltp']
-    df['call_risk_reward'] = (spot_price - df['strike'] + df['call_ltp']) / df['call_ltp']
-    df['put_risk_reward'] = (df['strike'] - spot_price + df['put_ltp']) / df['put_ltp']
-    
-    # Find best calls to buy (low premium ratio, high OI change, good risk/reward)
-    best_calls = df[(df['call_moneyness'] == 'OTM') & 
-                   (df['call_premium_ratio'] < 0.1) &
-                   (df['call_oi_change'] > 0)].sort_values(
-        by=['call_premium_ratio', 'call_oi_change'], 
-        ascending=[True, False]
-    ).head(3)
-    
-    for _, row in best_calls.iterrows():
-        recommendations.append({
-            'type': 'BUY CALL',
-            'strike': row['strike'],
-            'premium': row['call_ltp'],
-            'iv': row['call_iv'],
-            'oi_change': row['call_oi_change'],
-            'risk_reward': f"{row['call_risk_reward']:.1f}:1",
-            'reason': "Low spread, OI buildup, good risk/reward"
-        })
-    
-    # Find best puts to buy (low premium ratio, high OI change, good risk/reward)
-    best_puts = df[(df['put_moneyness'] == 'OTM') & 
-                  (df['put_premium_ratio'] < 0.1) &
-                  (df['put_oi_change'] > 0)].sort_values(
-        by=['put_premium_ratio', 'put_oi_change'], 
-        ascending=[True, False]
-    ).head(3)
-    
-    for _, row in best_puts.iterrows():
-        recommendations.append({
-            'type': 'BUY PUT',
-            'strike': row['strike'],
-            'premium': row['put_ltp'],
-            'iv': row['put_iv'],
-            'oi_change': row['put_oi_change'],
-            'risk_reward': f"{row['put_risk_reward']:.1f}:1",
-            'reason': "Low spread, OI buildup, good risk/reward"
-        })
-    
-    # Find best calls to sell (high premium ratio, decreasing OI)
-    best_sell_calls = df[(df['call_moneyness'] == 'ITM') & 
-                        (df['call_premium_ratio'] > 0.15) &
-                        (df['call_oi_change'] < 0)].sort_values(
-        by=['call_premium_ratio', 'call_oi_change'], 
-        ascending=[False, True]
-    ).head(2)
-    
-    for _, row in best_sell_calls.iterrows():
-        recommendations.append({
-            'type': 'SELL CALL',
-            'strike': row['strike'],
-            'premium': row['call_ltp'],
-            'iv': row['call_iv'],
-            'oi_change': row['call_oi_change'],
-            'risk_reward': f"{1/row['call_risk_reward']:.1f}:1",
-            'reason': "High spread, OI unwinding, favorable risk"
-        })
-    
-    # Find best puts to sell (high premium ratio, decreasing OI)
-    best_sell_puts = df[(df['put_moneyness'] == 'ITM') & 
-                       (df['put_premium_ratio'] > 0.15) &
-                       (df['put_oi_change'] < 0)].sort_values(
-        by=['put_premium_ratio', 'put_oi_change'], 
-        ascending=[False, True]
-    ).head(2)
-    
-    for _, row in best_sell_puts.iterrows():
-        recommendations.append({
-            'type': 'SELL PUT',
-            'strike': row['strike'],
-            'premium': row['put_ltp'],
-            'iv': row['put_iv'],
-            'oi_change': row['put_oi_change'],
-            'risk_reward': f"{1/row['put_risk_reward']:.1f}:1",
-            'reason': "High spread, OI unwinding, favorable risk"
-        })
-    
-    return recommendations
+def generate_trade_recommendations(df):
+    # Compare the integer category codes directly instead of matching labels
+    itm, otm = MONEYNESS.categories.get_indexer(['ITM', 'OTM'])
+    call_codes = df['call_moneyness'].cat.codes.to_numpy()
+    put_codes = df['put_moneyness'].cat.codes.to_numpy()
+    call_otm, call_itm = call_codes == otm, call_codes == itm
+    put_otm, put_itm = put_codes == otm, put_codes == itm
+    call_ratio = df['call_premium_ratio'].to_numpy()
+    put_ratio = df['put_premium_ratio'].to_numpy()
+    call_oi_change = df['call_oi_change'].to_numpy()
+    put_oi_change = df['put_oi_change'].to_numpy()
+    
+    buy_reason = "Low spread, OI buildup, good risk/reward"
+    sell_reason = "High spread, OI unwinding, favorable risk"
+    
+    return (
+        # Best options to buy (low premium ratio, high OI change, good risk/reward)
+        screen_trades(df, 'BUY CALL', call_otm & (call_ratio < 0.1) & (call_oi_change > 0), 3, buy_reason)
+        + screen_trades(df, 'BUY PUT', put_otm & (put_ratio < 0.1) & (put_oi_change > 0), 3, buy_reason)
+        
+        # Best options to sell (high premium ratio, decreasing OI)
+        + screen_trades(df, 'SELL CALL', call_itm & (call_ratio > 0.15) & (call_oi_change < 0), 2, sell_reason)
+        + screen_trades(df, 'SELL PUT', put_itm & (put_ratio > 0.15) & (put_oi_change < 0), 2, sell_reason)
+    )
+
+# Top strike cards and trade ideas depend only on the chain, so cache them
+# with the same key instead of recomputing them on every widget rerun. The
+# cards are cached already rendered to HTML.
+@st.cache_data(ttl=300)
+def analyze_options_chain(asset_key, expiry, spot_price):
+    df = load_options_chain(asset_key, expiry, spot_price)
+    strike_cards = {
+        group: strike_cards_html(rows)
+        for group, rows in get_top_strikes(df, spot_price).items()
+    }
+    return strike_cards, generate_trade_recommendations(df)
+
+# HTML for a column of strike cards from rows projected to CARD_COLUMNS
+def strike_cards_html(rows):
+    return "".join(
+        f"""
+            <div class='strike-card'>
+                <b>{strike:.0f}</b> (LTP: {ltp:.2f})<br>
+                OI: {oi:,} (Δ: {oi_change:,})<br>
+                IV: {iv:.1f}%
+            </div>
+        """
+        for strike, ltp, oi, oi_change, iv in rows.itertuples(index=False, name=None)
+    )
+
+# Render a column of prebuilt strike cards as a single markdown element
+def render_strike_cards(title, cards):
+    st.markdown(f"**{title}**")
+    st.markdown(cards, unsafe_allow_html=True)
+
+# Charts are built from graph_objects traces fed straight from the column
+# arrays; plotly.express would first melt each frame to long form
+LEG_COLORS = {'call': '#3498db', 'put': '#e74c3c'}
+
+# Full-height vertical marker line, as a plain layout shape
+def vline_shape(x, color, dash):
+    return dict(
+        type='line', x0=x, x1=x, xref='x', y0=0, y1=1, yref='y domain',
+        line=dict(color=color, dash=dash)
+    )
+
+# Build the IV skew chart. It only depends on the chain and spot price, so
+# strike selection reruns reuse the cached figure instead of rebuilding it
+@st.cache_data(ttl=300)
+def build_iv_skew_chart(iv_df, spot_price):
+    strikes = iv_df['strike'].to_numpy()
+    fig = go.Figure([
+        go.Scatter(x=strikes, y=iv_df[f"{leg}_iv"].to_numpy(), mode='lines', name=f"{leg}_iv", line_color=color)
+        for leg, color in LEG_COLORS.items()
+    ])
+    fig.update_layout(
+        title='Implied Volatility Skew',
+        xaxis_title='Strike Price',
+        yaxis_title='IV (%)',
+        legend_title_text='variable',
+        shapes=[vline_shape(spot_price, "gray", "dash")]
+    )
+    return fig
+
+# Build a grouped call/put bar chart for the strikes around the selection.
+# Cached like the IV skew chart so revisiting a strike reuses its figure
+@st.cache_data(ttl=300)
+def build_nearby_bar_chart(nearby_df, metric, title, label):
+    strikes = nearby_df['strike'].to_numpy()
+    fig = go.Figure([
+        go.Bar(x=strikes, y=nearby_df[f"{leg}_{metric}"].to_numpy(), name=f"{leg}_{metric}", marker_color=color)
+        for leg, color in LEG_COLORS.items()
+    ])
+    fig.update_layout(
+        barmode='group',
+        title=title,
+        xaxis_title='Strike Price',
+        yaxis_title=label,
+        legend_title_text='variable'
+    )
+    return fig
 
 # Main App
 def main():
     st.markdown("<div class='header'><h1>📊 PyStatIQ Options Chain Dashboard</h1></div>", unsafe_allow_html=True)
     
-    # Fetch spot price
-    spot_price = fetch_nifty_price()
-    if spot_price is None:
-        st.error("Failed to fetch Nifty spot price. Using default value.")
-        spot_price = 22000  # Default fallback
-    
     # Sidebar controls
     with st.sidebar:
         st.header("Filters")
         asset_key = st.selectbox(
             "Underlying Asset",
-            ["NSE_INDEX|Nifty 50", "NSE_INDEX|Bank Nifty"],
+            ASSET_KEYS,
             index=0
         )
         
@@ -298,8 +546,17 @@ def main():
             datetime.strptime("03-04-2025", "%d-%m-%Y")
         ).strftime("%d-%m-%Y")
         
+        # Refetch the selected chain and the spot price; other cached chains
+        # are left alone
+        refresh = st.button("🔄 Refresh Data")
+        if refresh:
+            chain_cache.invalidate(options_chain_url(asset_key, expiry_date))
+            fetch_options_data.clear(asset_key, expiry_date)
+            get_chain_fetch_times().pop((asset_key, expiry_date), None)
+            fetch_nifty_price.clear()  # Its single entry is shared by every session
+        
         st.markdown("---")
-        st.markdown(f"**Current Nifty Spot Price: {spot_price:,.2f}**")
+        spot_price_slot = st.empty()  # Filled in once the spot price is fetched
         
         st.markdown("---")
         st.markdown("**Analysis Settings**")
@@ -310,24 +567,44 @@ def main():
         st.markdown("**About**")
         st.markdown("This dashboard provides real-time options chain analysis using data.")
     
-    # Fetch and process data
+    # On a cold start fetch the chain alongside the spot price so the two
+    # round-trips overlap. Once it is in memory, load_options_chain reads it
+    # on its own and reruns never load the raw payload.
+    calls = [(fetch_nifty_price,)]
+    if not chain_in_memory(asset_key, expiry_date):
+        calls.append((fetch_options_data, asset_key, expiry_date))
     with st.spinner("Fetching live options data..."):
-        raw_data = fetch_options_data(asset_key, expiry_date)
+        spot_price = fetch_concurrently(*calls)[0]
     
-    if raw_data is None:
+    if spot_price is None:
+        st.error("Failed to fetch Nifty spot price. Using default value.")
+        spot_price = 22000  # Default fallback
+    spot_price_slot.markdown(f"**Current Nifty Spot Price: {spot_price:,.2f}**")
+    
+    # Processed entries are keyed by spot too, so drop them once it is known
+    if refresh:
+        load_options_chain.clear(asset_key, expiry_date, spot_price)
+        analyze_options_chain.clear(asset_key, expiry_date, spot_price)
+    
+    df = load_options_chain(asset_key, expiry_date, spot_price)
+    if df is None:
         st.error("Failed to load data. Please try again later.")
         return
-    
-    df = process_options_data(raw_data, spot_price)
-    if df is None or df.empty:
+    if df.empty:
         st.error("No data available for the selected parameters.")
         return
     
+    # Fetch the other underlyings' chains for this expiry while the user reads
+    for other_key in ASSET_KEYS:
+        if other_key != asset_key:
+            submit_prefetch(other_key, expiry_date)
+    
     # Get top strikes
-    top_strikes = get_top_strikes(df, spot_price)
+    strike_cards, recommendations = analyze_options_chain(asset_key, expiry_date, spot_price)
     
     # Default strike selection (ATM)
-    atm_strike = df.iloc[(df['strike'] - spot_price).abs().argsort()[:1]]['strike'].values[0]
+    strikes = df['strike'].to_numpy()
+    atm_index = int(np.abs(strikes - spot_price).argmin())
     
     # Main columns
     col1, col2, col3 = st.columns([1, 2, 1])
@@ -349,34 +626,40 @@ def main():
         # Strike price selector
         selected_strike = st.selectbox(
             "Select Strike Price",
-            df['strike'].unique(),
-            index=int(np.where(df['strike'].unique() == atm_strike)[0][0])
+            strikes,
+            index=atm_index
         )
         
+        # Locate the selected strike once with a binary search over the
+        # sorted strikes; its row position drives every per-strike view below
+        selected_idx = int(np.searchsorted(strikes, selected_strike))
+        strike_data = df.iloc[selected_idx]
+        
         # PCR gauge
-        pcr = df[df['strike'] == selected_strike]['pcr'].values[0]
-        fig = px.bar(x=[pcr], range_x=[0, 2], title=f"Put-Call Ratio: {pcr:.2f}")
+        pcr = strike_data['pcr']
+        fig = go.Figure(go.Bar(x=[pcr], y=[0], orientation='h', marker_color='#636efa'))
         fig.update_layout(
+            title=f"Put-Call Ratio: {pcr:.2f}",
+            xaxis_range=[0, 2],
             xaxis_title="PCR",
             yaxis_visible=False,
             height=150,
-            margin=dict(l=20, r=20, t=40, b=20)
+            margin=dict(l=20, r=20, t=40, b=20),
+            shapes=[vline_shape(0.7, "green", "dot"), vline_shape(1.3, "red", "dot")]
         )
-        fig.add_vline(x=0.7, line_dash="dot", line_color="green")
-        fig.add_vline(x=1.3, line_dash="dot", line_color="red")
         st.plotly_chart(fig, use_container_width=True)
     
     with col3:
         st.markdown("<div class='metric-card'>", unsafe_allow_html=True)
         st.markdown("**Call OI Change**")
-        call_oi_change = df[df['strike'] == selected_strike]['call_oi_change'].values[0]
+        call_oi_change = strike_data['call_oi_change']
         change_color = "positive" if call_oi_change > 0 else "negative"
         st.markdown(f"<h2 class='{change_color}'>{call_oi_change:,}</h2>", unsafe_allow_html=True)
         st.markdown("</div>", unsafe_allow_html=True)
         
         st.markdown("<div class='metric-card'>", unsafe_allow_html=True)
         st.markdown("**Put OI Change**")
-        put_oi_change = df[df['strike'] == selected_strike]['put_oi_change'].values[0]
+        put_oi_change = strike_data['put_oi_change']
         change_color = "positive" if put_oi_change > 0 else "negative"
         st.markdown(f"<h2 class='{change_color}'>{put_oi_change:,}</h2>", unsafe_allow_html=True)
         st.markdown("</div>", unsafe_allow_html=True)
@@ -386,52 +669,19 @@ def main():
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.markdown("**Top ITM Call Strikes**")
-        for _, row in top_strikes['call_itm'].iterrows():
-            st.markdown(f"""
-                <div class='strike-card'>
-                    <b>{row['strike']:.0f}</b> (LTP: {row['call_ltp']:.2f})<br>
-                    OI: {row['call_oi']:,} (Δ: {row['call_oi_change']:,})<br>
-                    IV: {row['call_iv']:.1f}%
-                </div>
-            """, unsafe_allow_html=True)
+        render_strike_cards("Top ITM Call Strikes", strike_cards['call_itm'])
     
     with col2:
-        st.markdown("**Top OTM Call Strikes**")
-        for _, row in top_strikes['call_otm'].iterrows():
-            st.markdown(f"""
-                <div class='strike-card'>
-                    <b>{row['strike']:.0f}</b> (LTP: {row['call_ltp']:.2f})<br>
-                    OI: {row['call_oi']:,} (Δ: {row['call_oi_change']:,})<br>
-                    IV: {row['call_iv']:.1f}%
-                </div>
-            """, unsafe_allow_html=True)
+        render_strike_cards("Top OTM Call Strikes", strike_cards['call_otm'])
     
     with col3:
-        st.markdown("**Top ITM Put Strikes**")
-        for _, row in top_strikes['put_itm'].iterrows():
-            st.markdown(f"""
-                <div class='strike-card'>
-                    <b>{row['strike']:.0f}</b> (LTP: {row['put_ltp']:.2f})<br>
-                    OI: {row['put_oi']:,} (Δ: {row['put_oi_change']:,})<br>
-                    IV: {row['put_iv']:.1f}%
-                </div>
-            """, unsafe_allow_html=True)
+        render_strike_cards("Top ITM Put Strikes", strike_cards['put_itm'])
     
     with col4:
-        st.markdown("**Top OTM Put Strikes**")
-        for _, row in top_strikes['put_otm'].iterrows():
-            st.markdown(f"""
-                <div class='strike-card'>
-                    <b>{row['strike']:.0f}</b> (LTP: {row['put_ltp']:.2f})<br>
-                    OI: {row['put_oi']:,} (Δ: {row['put_oi_change']:,})<br>
-                    IV: {row['put_iv']:.1f}%
-                </div>
-            """, unsafe_allow_html=True)
+        render_strike_cards("Top OTM Put Strikes", strike_cards['put_otm'])
     
     # Trade Recommendations
     st.markdown("### Trade Recommendations")
-    recommendations = generate_trade_recommendations(df, spot_price)
     
     if recommendations:
         for rec in recommendations:
@@ -455,38 +705,11 @@ def main():
     with tab1:
         st.markdown(f"### Detailed Analysis for Strike: {selected_strike}")
         
-        # Get selected strike data
-        strike_data = df[df['strike'] == selected_strike].iloc[0]
-        
-        # Create comparison table
+        # Create comparison table, pulling each leg's metrics in one lookup
         comparison_df = pd.DataFrame({
-            'Metric': ['LTP', 'Bid', 'Ask', 'Volume', 'OI', 'OI Change', 'IV', 'Delta', 'Gamma', 'Theta', 'Vega'],
-            'Call': [
-                strike_data['call_ltp'],
-                strike_data['call_bid'],
-                strike_data['call_ask'],
-                strike_data['call_volume'],
-                strike_data['call_oi'],
-                strike_data['call_oi_change'],
-                strike_data['call_iv'],
-                strike_data['call_delta'],
-                strike_data['call_gamma'],
-                strike_data['call_theta'],
-                strike_data['call_vega']
-            ],
-            'Put': [
-                strike_data['put_ltp'],
-                strike_data['put_bid'],
-                strike_data['put_ask'],
-                strike_data['put_volume'],
-                strike_data['put_oi'],
-                strike_data['put_oi_change'],
-                strike_data['put_iv'],
-                strike_data['put_delta'],
-                strike_data['put_gamma'],
-                strike_data['put_theta'],
-                strike_data['put_vega']
-            ]
+            'Metric': list(COMPARISON_METRICS),
+            'Call': strike_data[[f"call_{name}" for name in COMPARISON_METRICS.values()]].to_numpy(dtype=float),
+            'Put': strike_data[[f"put_{name}" for name in COMPARISON_METRICS.values()]].to_numpy(dtype=float)
         })
         
         st.dataframe(
@@ -501,33 +724,20 @@ def main():
     with tab2:
         st.markdown("### Open Interest & Volume Trends")
         
-        # Nearby strikes
-        all_strikes = sorted(df['strike'].unique())
-        current_idx = all_strikes.index(selected_strike)
-        nearby_strikes = all_strikes[max(0, current_idx-5):min(len(all_strikes), current_idx+6)]
-        nearby_df = df[df['strike'].isin(nearby_strikes)]
+        # Nearby strikes (rows are sorted by strike)
+        nearby_df = df.iloc[max(0, selected_idx-5):selected_idx+6]
         
         # OI Change plot
-        fig = px.bar(
-            nearby_df,
-            x='strike',
-            y=['call_oi_change', 'put_oi_change'],
-            barmode='group',
-            title=f'OI Changes Around {selected_strike}',
-            labels={'value': 'OI Change', 'strike': 'Strike Price'},
-            color_discrete_map={'call_oi_change': '#3498db', 'put_oi_change': '#e74c3c'}
+        fig = build_nearby_bar_chart(
+            nearby_df[['strike', 'call_oi_change', 'put_oi_change']],
+            'oi_change', f'OI Changes Around {selected_strike}', 'OI Change'
         )
         st.plotly_chart(fig, use_container_width=True)
         
         # Volume plot
-        fig = px.bar(
-            nearby_df,
-            x='strike',
-            y=['call_volume', 'put_volume'],
-            barmode='group',
-            title=f'Volume Around {selected_strike}',
-            labels={'value': 'Volume', 'strike': 'Strike Price'},
-            color_discrete_map={'call_volume': '#3498db', 'put_volume': '#e74c3c'}
+        fig = build_nearby_bar_chart(
+            nearby_df[['strike', 'call_volume', 'put_volume']],
+            'volume', f'Volume Around {selected_strike}', 'Volume'
         )
         st.plotly_chart(fig, use_container_width=True)
     
@@ -536,27 +746,14 @@ def main():
         
         # IV Skew Analysis
         st.markdown("#### IV Skew Analysis")
-        fig = px.line(
-            df,
-            x='strike',
-            y=['call_iv', 'put_iv'],
-            title='Implied Volatility Skew',
-            labels={'value': 'IV (%)', 'strike': 'Strike Price'},
-            color_discrete_map={'call_iv': '#3498db', 'put_iv': '#e74c3c'}
-        )
-        fig.add_vline(x=spot_price, line_dash="dash", line_color="gray")
+        fig = build_iv_skew_chart(df[['strike', 'call_iv', 'put_iv']], spot_price)
         st.plotly_chart(fig, use_container_width=True)
         
         # Risk Analysis
         st.markdown("#### Risk Analysis")
         
         # Max pain calculation
-        pain_points = []
-        for strike in df['strike'].unique():
-            strike_row = df[df['strike'] == strike].iloc[0]
-            pain_points.append((strike, strike_row['call_oi'] + strike_row['put_oi']))
-        
-        max_pain_strike = min(pain_points, key=lambda x: x[1])[0] if pain_points else selected_strike
+        max_pain_strike = strikes[df['total_oi'].to_numpy().argmin()]
         
         col1, col2 = st.columns(2)
         
@@ -566,7 +763,7 @@ def main():
             st.markdown(f"Current Strike: {selected_strike}")
             st.markdown(f"Max Pain Strike: {max_pain_strike}")
             
-            if abs(max_pain_strike - selected_strike) <= (all_strikes[1] - all_strikes[0]) * 2:
+            if abs(max_pain_strike - selected_strike) <= (strikes[1] - strikes[0]) * 2:
                 st.warning("Close to max pain - increased pin risk")
             else:
                 st.success("Not near max pain level")
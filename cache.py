@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+CACHE_DIR = Path.home() / ".optchain_cache"
+
+
+# On-disk cache for raw API responses, keyed by md5(url)
+class FileCache:
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+
+    def _paths(self, url):
+        key = hashlib.md5(url.encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{key}.json", self.cache_dir / f"{key}_meta.json"
+
+    def _read(self, url):
+        body_path, meta_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text())
+            return body_path.read_bytes(), meta
+        except (OSError, ValueError):
+            return None, None
+
+    def _write(self, path, data):
+        # Write to a temp file first so readers never see a partial blob
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    # A body is fresh if it was stored less than `ttl` seconds ago, or at any
+    # time at or after `final_after` (a Unix time past which it can't change),
+    # unless it has been invalidated since
+    def _fresh(self, meta, ttl, final_after):
+        if meta.get("invalidated"):
+            return False
+        if final_after is not None and meta["fetched_at"] >= final_after:
+            return True
+        return time.time() - meta["fetched_at"] <= ttl
+
+    # Cached body if it is still fresh, else None
+    def get(self, url, ttl, final_after=None):
+        body, meta = self._read(url)
+        if body is None or not self._fresh(meta, ttl, final_after):
+            return None
+        return body
+
+    # Whether a fresh body exists, without reading it
+    def is_fresh(self, url, ttl, final_after=None):
+        _, meta_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            return False
+        return self._fresh(meta, ttl, final_after)
+
+    # Cached body and its ETag regardless of age, for conditional requests
+    def get_stale(self, url):
+        body, meta = self._read(url)
+        if body is None:
+            return None, None
+        return body, meta.get("etag")
+
+    def _write_meta(self, url, etag):
+        _, meta_path = self._paths(url)
+        meta = {"fetched_at": time.time(), "etag": etag}
+        self._write(meta_path, json.dumps(meta).encode("utf-8"))
+
+    def put(self, url, body, etag=None):
+        body_path, _ = self._paths(url)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._write(body_path, body)
+            self._write_meta(url, etag)
+        except OSError:
+            pass  # Caching is best-effort
+
+    # Mark a cached body as fresh again (e.g. after a 304 Not Modified)
+    def touch(self, url):
+        _, meta = self._read(url)
+        if meta is None:
+            return
+        try:
+            self._write_meta(url, meta.get("etag"))
+        except OSError:
+            pass
+
+    # Force the next get()/is_fresh() to miss whatever the TTL or final_after,
+    # while keeping the ETag for revalidation. The flag clears on the next
+    # put() or touch().
+    def invalidate(self, url):
+        _, meta = self._read(url)
+        if meta is None:
+            return
+        _, meta_path = self._paths(url)
+        meta["invalidated"] = True
+        try:
+            self._write(meta_path, json.dumps(meta).encode("utf-8"))
+        except OSError:
+            pass